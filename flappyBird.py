@@ -1,4 +1,5 @@
 from terminalEngine import TerminalEngine
+import numpy as np
 import random
 from typing import List, Tuple
 
@@ -18,6 +19,10 @@ class FlappyBirdGame(TerminalEngine):
         self.background: List[str] = [" ", ".", "+", "*"]
         self.bg_positions: List[float] = [0, 0, 0, 0]
         self.bg_speeds: List[float] = [5, 10, 15, 20]
+        self.bg_rows: List[np.ndarray] = [
+            np.full(width, ord(char), dtype=self.buffer.dtype)
+            for char in self.background
+        ]
 
     def update(self, dt: float) -> None:
         if self.game_over:
@@ -47,32 +52,35 @@ class FlappyBirdGame(TerminalEngine):
 
         for pipe in self.pipes:
             pipe[0] -= 30 * dt
-            if pipe[0] < 0:
-                self.pipes.remove(pipe)
-                self.score += 1
-
             if 0 < pipe[0] < 5 and (
                 self.bird_y < pipe[1] or self.bird_y > pipe[1] + self.pipe_gap
             ):
                 self.game_over = True
 
+        kept = [pipe for pipe in self.pipes if pipe[0] >= 0]
+        self.score += len(self.pipes) - len(kept)
+        self.pipes = kept
+
         # Update parallax background
         for i in range(len(self.bg_positions)):
             self.bg_positions[i] -= self.bg_speeds[i] * dt
             if self.bg_positions[i] <= -self.width:
                 self.bg_positions[i] = 0
 
-        self.buffer.fill(" ")
+        self.buffer.fill(ord(" "))
         self.draw_background()
         self.draw_bird()
         self.draw_pipes()
         self.draw_text(1, 1, f"Score: {self.score}")
 
     def draw_background(self) -> None:
-        for i, char in enumerate(self.background):
-            pos = int(self.bg_positions[i])
-            for x in range(self.width):
-                self.draw_pixel((x + pos) % self.width, self.height - i - 1, char)
+        for i, row in enumerate(self.bg_rows):
+            y = self.height - i - 1
+            shift = int(self.bg_positions[i]) % self.width
+            # Same result as np.roll(row, shift) without the temporary
+            self.buffer[y, :shift] = row[self.width - shift :]
+            self.buffer[y, shift:] = row[: self.width - shift]
+            self.dirtyRows[y] = True
 
     def draw_bird(self) -> None:
         self.draw_pixel(5, int(self.bird_y), ">")
@@ -80,9 +88,11 @@ class FlappyBirdGame(TerminalEngine):
     def draw_pipes(self) -> None:
         for pipe in self.pipes:
             x, gap_start = int(pipe[0]), pipe[1]
-            for y in range(self.height):
-                if y < gap_start or y >= gap_start + self.pipe_gap:
-                    self.draw_pixel(x, y, "|")
+            if 0 <= x < self.width:
+                self.buffer[:gap_start, x] = ord("|")
+                self.buffer[gap_start + self.pipe_gap :, x] = ord("|")
+                self.dirtyRows[:gap_start] = True
+                self.dirtyRows[gap_start + self.pipe_gap :] = True
 
     def run(self) -> None:
         super().run()
\ No newline at end of file
@@ -1,42 +1,6 @@
 from terminalEngine import TerminalEngine
-import math
+import numpy as np
 import random
-from typing import List, Tuple
-
-
-class Bullet:
-    def __init__(self, x: float, y: float, dx: float, dy: float):
-        self.x = x
-        self.y = y
-        self.dx = dx
-        self.dy = dy
-
-    def update(self, dt: float) -> None:
-        self.x += self.dx * dt
-        self.y += self.dy * dt
-
-    def draw(self, engine: "ShooterRoguelike") -> None:
-        engine.draw_pixel(int(self.x), int(self.y), "*")
-
-
-class Enemy:
-    def __init__(self, x: float, y: float):
-        self.x = x
-        self.y = y
-        self.health = 3
-
-    def update(self, dt: float, player_x: float, player_y: float) -> None:
-        dx = player_x - self.x
-        dy = player_y - self.y
-        length = math.sqrt(dx * dx + dy * dy)
-        if length > 0:
-            dx /= length
-            dy /= length
-        self.x += dx * 10 * dt
-        self.y += dy * 10 * dt
-
-    def draw(self, engine: "ShooterRoguelike") -> None:
-        engine.draw_pixel(int(self.x), int(self.y), "E")
 
 
 class Player:
@@ -57,8 +21,10 @@ class ShooterRoguelike(TerminalEngine):
     def __init__(self, width: int, height: int):
         super().__init__(width, height)
         self.player = Player(width // 2, height - 5)
-        self.enemies: List[Enemy] = []
-        self.bullets: List[Bullet] = []
+        self.enemy_pos: np.ndarray = np.empty((0, 2))
+        self.enemy_health: np.ndarray = np.empty(0, dtype=int)
+        self.bullet_pos: np.ndarray = np.empty((0, 2))
+        self.bullet_vel: np.ndarray = np.empty((0, 2))
         self.level: int = 1
         self.score: int = 0
         self.game_over: bool = False
@@ -89,60 +55,88 @@ class ShooterRoguelike(TerminalEngine):
         self.player.update(dt, dx, dy)
 
         if self.is_key_pressed(" "):
-            self.bullets.append(Bullet(self.player.x, self.player.y, 0, -50))
+            self.bullet_pos = np.vstack(
+                (self.bullet_pos, (self.player.x, self.player.y))
+            )
+            self.bullet_vel = np.vstack((self.bullet_vel, (0, -50)))
 
-        for enemy in self.enemies:
-            enemy.update(dt, self.player.x, self.player.y)
+        speed_dt = 10 * dt
+        to_player = np.array([self.player.x, self.player.y]) - self.enemy_pos
+        length = np.hypot(to_player[:, 0], to_player[:, 1])
+        step = speed_dt / np.where(length > 0, length, 1)
+        self.enemy_pos += to_player * step[:, None]
 
-        for bullet in self.bullets:
-            bullet.update(dt)
+        self.bullet_pos += self.bullet_vel * dt
 
         self.check_collisions()
         self.spawn_enemies()
 
-        self.buffer.fill(" ")
+        self.buffer.fill(ord(" "))
         self.player.draw(self)
-        for enemy in self.enemies:
-            enemy.draw(self)
-        for bullet in self.bullets:
-            bullet.draw(self)
+        self.draw_entities(self.enemy_pos, "E")
+        self.draw_entities(self.bullet_pos, "*")
         self.draw_text(1, 1, f"Score: {self.score}")
         self.draw_text(1, 2, f"Health: {self.player.health}")
         self.draw_text(1, 3, f"Level: {self.level}")
 
     def check_collisions(self) -> None:
         # Check bullet-enemy collisions
-        for bullet in self.bullets[:]:
-            for enemy in self.enemies[:]:
-                if abs(bullet.x - enemy.x) < 1 and abs(bullet.y - enemy.y) < 1:
-                    self.bullets.remove(bullet)
-                    enemy.health -= 1
-                    if enemy.health <= 0:
-                        self.enemies.remove(enemy)
-                        self.score += 10
-                    break
+        if len(self.bullet_pos) and len(self.enemy_pos):
+            hit = (
+                np.abs(self.bullet_pos[:, None, :] - self.enemy_pos[None, :, :]) < 1
+            ).all(axis=2)
+            bullet_hit = hit.any(axis=1)
+            # A bullet only damages the first enemy it overlaps
+            self.enemy_health -= np.bincount(
+                hit[bullet_hit].argmax(axis=1), minlength=len(self.enemy_pos)
+            )
+            killed = self.enemy_health <= 0
+            self.score += 10 * int(killed.sum())
+            self.enemy_pos = self.enemy_pos[~killed]
+            self.enemy_health = self.enemy_health[~killed]
+            self.bullet_pos = self.bullet_pos[~bullet_hit]
+            self.bullet_vel = self.bullet_vel[~bullet_hit]
 
         # Check player-enemy collisions
-        for enemy in self.enemies[:]:
-            if abs(self.player.x - enemy.x) < 1 and abs(self.player.y - enemy.y) < 1:
-                self.enemies.remove(enemy)
-                self.player.health -= 10
+        if len(self.enemy_pos):
+            touching = (
+                np.abs(self.enemy_pos - (self.player.x, self.player.y)) < 1
+            ).all(axis=1)
+            if touching.any():
+                self.enemy_pos = self.enemy_pos[~touching]
+                self.enemy_health = self.enemy_health[~touching]
+                self.player.health -= 10 * int(touching.sum())
                 if self.player.health <= 0:
                     self.game_over = True
 
         # Remove bullets that are out of bounds
-        self.bullets = [b for b in self.bullets if 0 <= b.y < self.height]
+        in_bounds = (0 <= self.bullet_pos[:, 1]) & (self.bullet_pos[:, 1] < self.height)
+        self.bullet_pos = self.bullet_pos[in_bounds]
+        self.bullet_vel = self.bullet_vel[in_bounds]
 
     def spawn_enemies(self) -> None:
         if random.random() < 0.02 * self.level:
-            x = random.randint(0, self.width - 1)
-            self.enemies.append(Enemy(x, 0))
+            self.add_enemies(1)
 
-        if len(self.enemies) == 0:
+        if len(self.enemy_pos) == 0:
             self.level += 1
-            for _ in range(self.level):
-                x = random.randint(0, self.width - 1)
-                self.enemies.append(Enemy(x, 0))
+            self.add_enemies(self.level)
+
+    def add_enemies(self, count: int) -> None:
+        xs = [random.randint(0, self.width - 1) for _ in range(count)]
+        self.enemy_pos = np.vstack((self.enemy_pos, np.column_stack((xs, [0] * count))))
+        self.enemy_health = np.append(self.enemy_health, [3] * count)
+
+    def draw_entities(self, positions: np.ndarray, char: str) -> None:
+        cells = positions.astype(int)
+        visible = (
+            (0 <= cells[:, 0])
+            & (cells[:, 0] < self.width)
+            & (0 <= cells[:, 1])
+            & (cells[:, 1] < self.height)
+        )
+        self.buffer[cells[visible, 1], cells[visible, 0]] = ord(char)
+        self.dirtyRows[cells[visible, 1]] = True
 
     def run(self) -> None:
         super().run()
\ No newline at end of file
@@ -2,9 +2,9 @@ import time
 import os
 import sys
 import select
-import threading
-import atexit
-from typing import Set, Optional
+import signal
+from types import FrameType
+from typing import Callable, List, Optional
 import numpy as np
 
 if os.name == "nt":
@@ -13,78 +13,310 @@ else:
     import termios
     import tty
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def jit(function):
+    return njit(cache=True)(function) if njit is not None else function
+
+
+@jit
+def writeDecimal(out: np.ndarray, n: int, value: int) -> int:
+    digits = 1
+    while value >= 10**digits:
+        digits += 1
+    for i in range(digits - 1, -1, -1):
+        out[n + i] = 48 + value % 10
+        value //= 10
+    return n + digits
+
+
+@jit
+def writeCodepoint(out: np.ndarray, n: int, code: int) -> int:
+    # UTF-8 encode a single code point; lone surrogates become U+FFFD
+    if code < 0x80:
+        out[n] = code
+        return n + 1
+    if code < 0x800:
+        out[n] = 0xC0 | (code >> 6)
+        out[n + 1] = 0x80 | (code & 0x3F)
+        return n + 2
+    if 0xD800 <= code < 0xE000:
+        code = 0xFFFD
+    if code < 0x10000:
+        out[n] = 0xE0 | (code >> 12)
+        out[n + 1] = 0x80 | ((code >> 6) & 0x3F)
+        out[n + 2] = 0x80 | (code & 0x3F)
+        return n + 3
+    out[n] = 0xF0 | (code >> 18)
+    out[n + 1] = 0x80 | ((code >> 12) & 0x3F)
+    out[n + 2] = 0x80 | ((code >> 6) & 0x3F)
+    out[n + 3] = 0x80 | (code & 0x3F)
+    return n + 4
+
+
+@jit
+def writeReset(out: np.ndarray, n: int) -> int:
+    out[n] = 27
+    out[n + 1] = 91
+    out[n + 2] = 48
+    out[n + 3] = 109
+    return n + 4
+
+
+@jit
+def encodeFrame(
+    buffer: np.ndarray,
+    prevBuffer: np.ndarray,
+    colorBuffer: np.ndarray,
+    prevColorBuffer: np.ndarray,
+    rows: np.ndarray,
+    sgrTable: np.ndarray,
+    sgrLengths: np.ndarray,
+    out: np.ndarray,
+) -> int:
+    # Diff, encode, copy into prev and blank for the next frame in one pass
+    n = 0
+    width = buffer.shape[1]
+    for y in rows:
+        x = 0
+        while x < width:
+            if (
+                buffer[y, x] == prevBuffer[y, x]
+                and colorBuffer[y, x] == prevColorBuffer[y, x]
+            ):
+                buffer[y, x] = 32
+                colorBuffer[y, x] = 0
+                x += 1
+                continue
+            out[n] = 27
+            out[n + 1] = 91
+            n = writeDecimal(out, n + 2, y + 1)
+            out[n] = 59
+            n = writeDecimal(out, n + 1, x + 1)
+            out[n] = 72
+            n += 1
+            # Only emit SGR codes where the color changes along the run
+            current = 0
+            while x < width and (
+                buffer[y, x] != prevBuffer[y, x]
+                or colorBuffer[y, x] != prevColorBuffer[y, x]
+            ):
+                color = colorBuffer[y, x]
+                if color != current:
+                    if current:
+                        n = writeReset(out, n)
+                    for i in range(sgrLengths[color]):
+                        out[n + i] = sgrTable[color, i]
+                    n += sgrLengths[color]
+                    current = color
+                n = writeCodepoint(out, n, buffer[y, x])
+                prevBuffer[y, x] = buffer[y, x]
+                prevColorBuffer[y, x] = color
+                buffer[y, x] = 32
+                colorBuffer[y, x] = 0
+                x += 1
+            if current:
+                n = writeReset(out, n)
+    return n
+
 
 class TerminalEngine:
+    NO_KEYS: bytes = bytes(128)
+
     def __init__(self, width: int, height: int, tickRate: int = 60, maxFps: int = 60):
         self.width: int = width
         self.height: int = height
-        self.buffer: np.ndarray = np.full((height, width), " ", dtype=str)
-        self.prevBuffer: np.ndarray = np.full((height, width), " ", dtype=str)
+        # Cells hold Unicode code points
+        self.buffer: np.ndarray = np.full((height, width), ord(" "), dtype=np.uint32)
+        self.prevBuffer: np.ndarray = np.full(
+            (height, width), ord(" "), dtype=np.uint32
+        )
+        self.colorBuffer: np.ndarray = np.zeros((height, width), dtype=np.uint8)
+        self.prevColorBuffer: np.ndarray = np.zeros((height, width), dtype=np.uint8)
+        self.setColors([])
+        self.cursorEscapes: List[List[bytes]] = [
+            [f"\033[{y+1};{x+1}H".encode() for x in range(width)] for y in range(height)
+        ]
+        # Rows drawn this frame and last frame; code writing to buffer
+        # directly must mark the rows it touches
+        self.dirtyRows: np.ndarray = np.zeros(height, dtype=bool)
+        self.prevDirtyRows: np.ndarray = np.zeros(height, dtype=bool)
+        self.stdoutFd: int = sys.stdout.fileno()
         self.running: bool = False
         self.tickRate: int = tickRate
         self.maxFps: int = maxFps
         self.tickDuration: float = 1.0 / tickRate
         self.frameDuration: float = 1.0 / maxFps
-        self.keysPressed: Set[str] = set()
-        self.keysReleased: Set[str] = set()
-        self.inputThread: Optional[threading.Thread] = None
+        # One slot per ASCII code, set when the key was seen this frame
+        self.keys: bytearray = bytearray(128)
+        self.prevKeys: bytearray = bytearray(128)
 
+        # Bind the platform-specific per-frame handlers once
         if os.name != "nt":
             self.oldSettings = termios.tcgetattr(sys.stdin)
+            self.stdinFd: int = sys.stdin.fileno()
+            self.pollInput: Callable[[float], None] = self.pollInputPosix
+            self.writeFrame: Callable[[memoryview], None] = self.writeFramePosix
         else:
             self.oldSettings = None
+            self.pollInput = self.pollInputWindows
+            self.writeFrame = self.writeFrameWindows
+
+    def setColors(self, codes: List[str]) -> None:
+        # SGR prefix for each color index; index 0 is the terminal default.
+        # Padded to every uint8 index so unregistered colors draw uncolored
+        # instead of reading past the tables
+        colorCodes = [b""] + [code.encode() for code in codes]
+        if len(colorCodes) > 256:
+            raise ValueError("at most 255 colors can be registered")
+        self.colorCodes: List[bytes] = colorCodes + [b""] * (256 - len(colorCodes))
+        sgrWidth = max(len(code) for code in self.colorCodes)
+        self.sgrLengths: np.ndarray = np.array(
+            [len(c) for c in self.colorCodes], dtype=np.int64
+        )
+        self.sgrTable: np.ndarray = np.zeros(
+            (len(self.colorCodes), sgrWidth), dtype=np.uint8
+        )
+        for i, code in enumerate(self.colorCodes):
+            self.sgrTable[i, : len(code)] = np.frombuffer(code, dtype=np.uint8)
+        # Worst case per cell: a cursor move, the SGR prefix, 4 bytes and a reset
+        self.frameBytes: np.ndarray = np.empty(
+            self.height * self.width * (16 + sgrWidth + 7), dtype=np.uint8
+        )
+        self.frameView: memoryview = memoryview(self.frameBytes)
 
     def clearScreen(self) -> None:
         os.system("cls" if os.name == "nt" else "clear")
 
-    def drawPixel(self, x: int, y: int, char: str) -> None:
+    def drawPixel(self, x: int, y: int, char: str, color: int = 0) -> None:
         if 0 <= x < self.width and 0 <= y < self.height:
-            self.buffer[y, x] = char
+            self.buffer[y, x] = ord(char)
+            self.colorBuffer[y, x] = color
+            self.dirtyRows[y] = True
 
     def drawText(self, x: int, y: int, text: str) -> None:
-        for i, char in enumerate(text):
-            self.drawPixel(x + i, y, char)
+        if not 0 <= y < self.height or x >= self.width:
+            return
+        # Clip to the visible columns, then write the string as one slice
+        start = max(0, x)
+        text = text[start - x : self.width - x]
+        if text:
+            end = start + len(text)
+            self.buffer[y, start:end] = np.frombuffer(
+                text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32
+            )
+            self.colorBuffer[y, start:end] = 0
+            self.dirtyRows[y] = True
 
     def render(self) -> None:
-        diff = self.buffer != self.prevBuffer
-        yIndices, xIndices = np.where(diff)
-        for y, x in zip(yIndices, xIndices):
-            sys.stdout.write(f"\033[{y+1};{x+1}H{self.buffer[y, x]}")
+        # Leaves the buffer blank for the next frame.
+        # Rows drawn in neither frame are blank in both buffers
+        rows = np.flatnonzero(self.dirtyRows | self.prevDirtyRows)
+        self.prevDirtyRows, self.dirtyRows = self.dirtyRows, self.prevDirtyRows
+        self.dirtyRows.fill(False)
+        if not rows.size:
+            return
+
+        if njit is not None:
+            length = encodeFrame(
+                self.buffer,
+                self.prevBuffer,
+                self.colorBuffer,
+                self.prevColorBuffer,
+                rows,
+                self.sgrTable,
+                self.sgrLengths,
+                self.frameBytes,
+            )
+        else:
+            length = self.encodeRuns(rows)
+            # Nothing changed: the buffers already match, so skip the copy
+            if length:
+                self.prevBuffer[rows] = self.buffer[rows]
+                self.prevColorBuffer[rows] = self.colorBuffer[rows]
+            self.buffer[rows] = ord(" ")
+            self.colorBuffer[rows] = 0
+        if length:
+            self.writeFrame(self.frameView[:length])
+
+    def writeFramePosix(self, frame: memoryview) -> None:
+        # Raw fd writes skip the text layer; loop in case of a short write
+        while frame:
+            frame = frame[os.write(self.stdoutFd, frame) :]
+
+    def writeFrameWindows(self, frame: memoryview) -> None:
+        sys.stdout.buffer.write(frame)
         sys.stdout.flush()
-        np.copyto(self.prevBuffer, self.buffer)
-
-    def inputHandler(self) -> None:
-        while self.running:
-            if os.name == "nt":
-                if msvcrt.kbhit():
-                    key = msvcrt.getch().decode("utf-8").lower()
-                    self.keysPressed.add(key)
-            else:
-                rlist, _, _ = select.select([sys.stdin], [], [], 0.1)
-                if rlist:
-                    key = sys.stdin.read(1).lower()
-                    self.keysPressed.add(key)
-            time.sleep(0.01)
-
-    def startInputThread(self) -> None:
-        self.inputThread = threading.Thread(target=self.inputHandler)
-        self.inputThread.daemon = True
-        self.inputThread.start()
-
-    def stopInputThread(self) -> None:
-        self.running = False
-        if self.inputThread:
-            self.inputThread.join()
+
+    def encodeRuns(self, rows: np.ndarray) -> int:
+        diff = (self.buffer[rows] != self.prevBuffer[rows]) | (
+            self.colorBuffer[rows] != self.prevColorBuffer[rows]
+        )
+        # Encode into the preallocated frame scratch and return the length
+        out = self.frameView
+        n = 0
+        for i in np.flatnonzero(diff.any(axis=1)):
+            y = rows[i]
+            cursorRow = self.cursorEscapes[y]
+            # Edges of the changed spans alternate start, end, start, end...
+            edges = np.flatnonzero(np.diff(diff[i], prepend=False, append=False))
+            for start, end in zip(edges[::2].tolist(), edges[1::2].tolist()):
+                codes = self.buffer[y, start:end]
+                colors = self.colorBuffer[y, start:end]
+                chunk = cursorRow[start]
+                # Split the run where the color changes and emit SGR only there
+                splits = (np.flatnonzero(np.diff(colors)) + 1).tolist()
+                bounds = [0, *splits, len(codes)]
+                current = 0
+                for a, b in zip(bounds, bounds[1:]):
+                    color = int(colors[a])
+                    if color != current:
+                        if current:
+                            chunk += b"\033[0m"
+                        chunk += self.colorCodes[color]
+                        current = color
+                    chunk += (
+                        codes[a:b].tobytes().decode("utf-32-le", "replace").encode()
+                    )
+                if current:
+                    chunk += b"\033[0m"
+                out[n : n + len(chunk)] = chunk
+                n += len(chunk)
+        return n
+
+    def pollInputPosix(self, timeout: float = 0.0) -> None:
+        # Wait up to timeout seconds, returning as soon as a key arrives
+        rlist, _, _ = select.select([self.stdinFd], [], [], timeout)
+        if rlist:
+            # Drain everything that is buffered in one read. Bytes of
+            # multi-byte UTF-8 characters are all >= 128 and are skipped
+            for code in os.read(self.stdinFd, 64).lower():
+                if code < 128:
+                    self.keys[code] = 1
+
+    def pollInputWindows(self, timeout: float = 0.0) -> None:
+        # Console handles cannot be selected on, so sleep and then drain
+        time.sleep(timeout)
+        while msvcrt.kbhit():
+            code = ord(msvcrt.getch().decode("utf-8").lower())
+            if code < 128:
+                self.keys[code] = 1
 
     def isKeyPressed(self, key: str) -> bool:
-        return key in self.keysPressed
+        code = ord(key)
+        return code < 128 and self.keys[code] != 0
 
     def isKeyReleased(self, key: str) -> bool:
-        return key in self.keysReleased
+        code = ord(key)
+        return code < 128 and self.prevKeys[code] != 0
 
     def clearKeyStates(self) -> None:
-        self.keysReleased = self.keysPressed
-        self.keysPressed = set()
+        self.prevKeys, self.keys = self.keys, self.prevKeys
+        self.keys[:] = self.NO_KEYS
 
     def update(self, dt: float) -> None:
         pass
@@ -94,24 +326,42 @@ class TerminalEngine:
             tty.setraw(sys.stdin.fileno())
 
     def restoreTerminal(self) -> None:
-        if os.name != "nt":
-            termios.tcsetattr(sys.stdin, termios.TCSADRAIN, self.oldSettings)
+        oldSettings = self.oldSettings
+        if oldSettings is not None:
+            termios.tcsetattr(self.stdinFd, termios.TCSADRAIN, oldSettings)
         print("\033[?25h", end="", flush=True)  # Show cursor
 
+    def handleTerminate(self, signum: int, frame: Optional[FrameType]) -> None:
+        self.running = False
+
     def run(self) -> None:
         self.running = True
-        self.clearScreen()
-        print("\033[?25l", end="", flush=True)  # Hide cursor
-
-        self.setRawMode()
-        atexit.register(self.restoreTerminal)
+        # Let SIGTERM end the loop so the finally block restores the terminal.
+        # Installed before the terminal is touched, since it raises
+        # ValueError when run() is called off the main thread
+        previousHandler = signal.signal(signal.SIGTERM, self.handleTerminate)
 
-        self.startInputThread()
+        try:
+            self.clearScreen()
+            print("\033[?25l", end="", flush=True)  # Hide cursor
+            self.setRawMode()
+            if njit is not None:
+                # Compile the frame kernel before the first frame
+                encodeFrame(
+                    self.buffer,
+                    self.prevBuffer,
+                    self.colorBuffer,
+                    self.prevColorBuffer,
+                    np.empty(0, dtype=np.intp),
+                    self.sgrTable,
+                    self.sgrLengths,
+                    self.frameBytes,
+                )
 
-        previousTime = time.perf_counter()
-        lag = 0.0
+            previousTime = time.perf_counter()
+            nextFrame = previousTime + self.frameDuration
+            lag = 0.0
 
-        try:
             while self.running:
                 currentTime = time.perf_counter()
                 elapsed = currentTime - previousTime
@@ -124,16 +374,24 @@ class TerminalEngine:
                     lag -= self.tickDuration
                     updateCount += 1
 
-                self.render()  # Render first
-                self.clearKeyStates()
-
-                # Now clear the buffer for the next frame
-                self.buffer.fill(" ")
+                # Without an update the buffer is still blank and the keys
+                # unread, so keep both for the next frame
+                if updateCount:
+                    self.render()  # Also clears the buffer for the next frame
+                    self.clearKeyStates()
 
-                frameEnd = time.perf_counter()
-                frameElapsed = frameEnd - currentTime
-                if frameElapsed < self.frameDuration:
-                    time.sleep(self.frameDuration - frameElapsed)
+                # Wait for the next frame on a fixed cadence; a key press
+                # wakes the poll early, so keep polling until the deadline
+                while True:
+                    self.pollInput(max(0.0, nextFrame - time.perf_counter()))
+                    frameEnd = time.perf_counter()
+                    if frameEnd >= nextFrame:
+                        break
+                nextFrame += self.frameDuration
+                if nextFrame < frameEnd:
+                    # More than a frame behind: resync instead of catching up
+                    nextFrame = frameEnd + self.frameDuration
         finally:
-            self.stopInputThread()
+            self.running = False
+            signal.signal(signal.SIGTERM, previousHandler)
             self.restoreTerminal()
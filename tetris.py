@@ -1,20 +1,49 @@
-from terminalEngine import TerminalEngine
+from terminalEngine import TerminalEngine, jit, njit
 import numpy as np
 import time
 import random
 from typing import Optional, Tuple, List
 
 
+@jit
+def collides(occupied: np.ndarray, shape: np.ndarray, x: int, y: int) -> bool:
+    height, width = occupied.shape
+    for j in range(shape.shape[0]):
+        for i in range(shape.shape[1]):
+            if shape[j, i] and (
+                y + j >= height or x + i < 0 or x + i >= width or occupied[y + j, x + i]
+            ):
+                return True
+    return False
+
+
+@jit
+def ghost_drop(occupied: np.ndarray, shape: np.ndarray, x: int, y: int) -> int:
+    while not collides(occupied, shape, x, y + 1):
+        y += 1
+    return y
+
+
 class TetrisGame(TerminalEngine):
     def __init__(self, width: int, height: int):
         super().__init__(width, height)
         self.board_width: int = 10
         self.board_height: int = 20
-        self.board: np.ndarray = np.full(
-            (self.board_height, self.board_width), " ", dtype=str
+        # Color index of each settled cell, 0 where empty
+        self.board: np.ndarray = np.zeros(
+            (self.board_height, self.board_width), dtype=np.uint8
+        )
+        # Mirror of board != 0, kept in sync by merge_piece and clear_lines
+        self.board_occupied: np.ndarray = np.zeros(
+            (self.board_height, self.board_width), dtype=bool
         )
-        self.current_piece: Optional[Tuple[np.ndarray, str]] = None
-        self.next_piece: Optional[Tuple[np.ndarray, str]] = None
+        # Filled cells per board row, so full rows are found without a scan
+        self.row_fill: np.ndarray = np.zeros(self.board_height, dtype=np.int16)
+        self.current_piece: Optional[Tuple[np.ndarray, int]] = None
+        self.next_index: Optional[int] = None
+        self.current_index: int = 0
+        self.current_rotation: int = 0
+        self.bag: List[int] = []
         self.score: int = 0
         self.level: int = 1
         self.lines_cleared: int = 0
@@ -23,13 +52,13 @@ class TetrisGame(TerminalEngine):
         self.last_drop_time: float = time.time()
 
         self.shapes: List[np.ndarray] = [
-            np.array([[1, 1, 1, 1]]),
-            np.array([[1, 1], [1, 1]]),
-            np.array([[1, 1, 1], [0, 1, 0]]),
-            np.array([[1, 1, 1], [1, 0, 0]]),
-            np.array([[1, 1, 1], [0, 0, 1]]),
-            np.array([[1, 1, 0], [0, 1, 1]]),
-            np.array([[0, 1, 1], [1, 1, 0]]),
+            np.array([[1, 1, 1, 1]], dtype=bool),
+            np.array([[1, 1], [1, 1]], dtype=bool),
+            np.array([[1, 1, 1], [0, 1, 0]], dtype=bool),
+            np.array([[1, 1, 1], [1, 0, 0]], dtype=bool),
+            np.array([[1, 1, 1], [0, 0, 1]], dtype=bool),
+            np.array([[1, 1, 0], [0, 1, 1]], dtype=bool),
+            np.array([[0, 1, 1], [1, 1, 0]], dtype=bool),
         ]
         self.colors: List[str] = [
             "\033[91m",
@@ -40,130 +69,127 @@ class TetrisGame(TerminalEngine):
             "\033[96m",
             "\033[97m",
         ]
+        # All four clockwise rotations of each shape, contiguous so the
+        # compiled collision check sees one array layout
+        self.rotations: List[List[np.ndarray]] = [
+            [np.ascontiguousarray(np.rot90(shape, k=-turns)) for turns in range(4)]
+            for shape in self.shapes
+        ]
+        # Shape i is drawn with engine color index i + 1
+        self.setColors(self.colors)
 
     def new_piece(self) -> None:
-        if not self.next_piece:
-            self.next_piece = self.random_piece()
-        self.current_piece = self.next_piece
-        self.next_piece = self.random_piece()
+        if self.next_index is None:
+            self.next_index = self.random_piece()
+        self.current_index = self.next_index
+        self.current_rotation = 0
+        self.current_piece = (
+            self.rotations[self.current_index][0],
+            self.current_index + 1,
+        )
+        self.next_index = self.random_piece()
         self.current_x = self.board_width // 2 - self.current_piece[0].shape[1] // 2
         self.current_y = 0
 
-        if self.collision():
+        if self.collision(self.current_piece[0], self.current_x, self.current_y):
             self.game_over = True
 
-    def random_piece(self) -> Tuple[np.ndarray, str]:
-        index = random.randint(0, len(self.shapes) - 1)
-        shape = self.shapes[index]
-        color = self.colors[index]
-        return shape, color
-
-    def collision(self) -> bool:
-        for y, row in enumerate(self.current_piece[0]):
-            for x, cell in enumerate(row):
-                if cell:
-                    if (
-                        self.current_y + y >= self.board_height
-                        or self.current_x + x < 0
-                        or self.current_x + x >= self.board_width
-                        or self.board[self.current_y + y, self.current_x + x] != " "
-                    ):
-                        return True
-        return False
+    def random_piece(self) -> int:
+        # 7-bag randomizer: deal each shape once per shuffled bag
+        if not self.bag:
+            self.bag = list(range(len(self.shapes)))
+            random.shuffle(self.bag)
+        return self.bag.pop()
+
+    def collision(self, shape: np.ndarray, x: int, y: int) -> bool:
+        if njit is not None:
+            return collides(self.board_occupied, shape, x, y)
+        h, w = shape.shape
+        if y + h > self.board_height or x < 0 or x + w > self.board_width:
+            return True
+        return bool((self.board_occupied[y : y + h, x : x + w] & shape).any())
 
     def merge_piece(self) -> None:
-        for y, row in enumerate(self.current_piece[0]):
-            for x, cell in enumerate(row):
-                if cell:
-                    self.board[self.current_y + y, self.current_x + x] = (
-                        self.current_piece[1]
-                    )
+        shape, color = self.current_piece
+        h, w = shape.shape
+        x, y = self.current_x, self.current_y
+        self.board[y : y + h, x : x + w][shape] = color
+        self.board_occupied[y : y + h, x : x + w] |= shape
+        self.row_fill[y : y + h] += shape.sum(axis=1)
 
     def rotate_piece(self) -> None:
-        rotated = np.rot90(self.current_piece[0], k=-1)
-        old_piece = self.current_piece
-        self.current_piece = (rotated, self.current_piece[1])
-        if self.collision():
-            self.current_piece = old_piece
+        rotation = (self.current_rotation + 1) & 3
+        rotated = self.rotations[self.current_index][rotation]
+        if not self.collision(rotated, self.current_x, self.current_y):
+            self.current_rotation = rotation
+            self.current_piece = (rotated, self.current_piece[1])
 
     def move_piece(self, dx: int) -> None:
-        self.current_x += dx
-        if self.collision():
-            self.current_x -= dx
+        if not self.collision(
+            self.current_piece[0], self.current_x + dx, self.current_y
+        ):
+            self.current_x += dx
 
     def drop_piece(self) -> None:
-        self.current_y += 1
-        if self.collision():
-            self.current_y -= 1
+        if self.collision(self.current_piece[0], self.current_x, self.current_y + 1):
             self.merge_piece()
             self.new_piece()
             self.clear_lines()
+        else:
+            self.current_y += 1
 
     def clear_lines(self) -> None:
-        lines_to_clear = np.all(self.board != " ", axis=1)
-        num_cleared = np.sum(lines_to_clear)
+        lines_to_clear = self.row_fill == self.board_width
+        num_cleared = int(np.count_nonzero(lines_to_clear))
         if num_cleared:
-            self.board = np.vstack(
-                (
-                    np.full((num_cleared, self.board_width), " "),
-                    self.board[~lines_to_clear],
-                )
-            )
+            # Shift the surviving rows down in place and blank the top
+            self.board[num_cleared:] = self.board[~lines_to_clear]
+            self.board[:num_cleared] = 0
+            self.board_occupied[num_cleared:] = self.board_occupied[~lines_to_clear]
+            self.board_occupied[:num_cleared] = False
+            self.row_fill[num_cleared:] = self.row_fill[~lines_to_clear]
+            self.row_fill[:num_cleared] = 0
             self.lines_cleared += num_cleared
             self.score += (num_cleared**2) * 100
             self.level = self.lines_cleared // 10 + 1
             self.drop_interval = max(0.1, 1.0 - (self.level - 1) * 0.1)
 
-    def draw_pixel(
-        self, x: int, y: int, char: str, color: Optional[str] = None
-    ) -> None:
-        if 0 <= x < self.width and 0 <= y < self.height:
-            if color:
-                self.buffer[y, x] = f"{color}{char}\033[0m"
-            else:
-                self.buffer[y, x] = char
+    def ghost_row(self, shape: np.ndarray, x: int, y: int) -> int:
+        if njit is not None:
+            return ghost_drop(self.board_occupied, shape, x, y)
+        h, w = shape.shape
+        # Lowest filled cell of the piece in each of its columns
+        bottoms = y + h - 1 - shape[::-1].argmax(axis=0)
+        # First occupied board cell below each of those, or the floor
+        rows = np.arange(self.board_height)[:, None]
+        below = self.board_occupied[:, x : x + w] & (rows > bottoms)
+        landing = np.where(below.any(axis=0), below.argmax(axis=0), self.board_height)
+        return y + int((landing - bottoms).min()) - 1
 
     def draw_board(self) -> None:
-        for y, row in enumerate(self.board):
-            for x, cell in enumerate(row):
-                if cell != " ":
-                    self.draw_pixel(x + 1, y + 1, "█", cell)
-                else:
-                    self.draw_pixel(x + 1, y + 1, "·")
+        rows = slice(1, 1 + self.board_height)
+        cols = slice(1, 1 + self.board_width)
+        self.buffer[rows, cols] = np.where(self.board_occupied, ord("█"), ord("·"))
+        self.colorBuffer[rows, cols] = self.board
+        self.dirtyRows[rows] = True
 
         if self.current_piece:
-            ghost_y = self.current_y
-            while not self.collision():
-                ghost_y += 1
-            ghost_y -= 1
-
-            for y, row in enumerate(self.current_piece[0]):
-                for x, cell in enumerate(row):
-                    if cell:
-                        self.draw_pixel(
-                            self.current_x + x + 1,
-                            ghost_y + y + 1,
-                            "□",
-                            self.current_piece[1],
-                        )
-                        self.draw_pixel(
-                            self.current_x + x + 1,
-                            self.current_y + y + 1,
-                            "█",
-                            self.current_piece[1],
-                        )
+            shape, color = self.current_piece
+            ghost_y = self.ghost_row(shape, self.current_x, self.current_y)
+            ys, xs = np.nonzero(shape)
+            xs = xs + self.current_x + 1
+            self.draw_cells(ys + ghost_y + 1, xs, "□", color)
+            self.draw_cells(ys + self.current_y + 1, xs, "█", color)
 
     def draw_next_piece(self) -> None:
-        if self.next_piece:
-            for y, row in enumerate(self.next_piece[0]):
-                for x, cell in enumerate(row):
-                    if cell:
-                        self.draw_pixel(
-                            self.board_width + 5 + x,
-                            5 + y,
-                            "█",
-                            self.next_piece[1],
-                        )
+        if self.next_index is not None:
+            ys, xs = np.nonzero(self.shapes[self.next_index])
+            self.draw_cells(ys + 5, xs + self.board_width + 5, "█", self.next_index + 1)
+
+    def draw_cells(self, ys: np.ndarray, xs: np.ndarray, char: str, color: int) -> None:
+        self.buffer[ys, xs] = ord(char)
+        self.colorBuffer[ys, xs] = color
+        self.dirtyRows[ys] = True
 
     #     def update(self, dt: float) -> None:
     #         if self.game_over:
@@ -205,7 +231,7 @@ class TetrisGame(TerminalEngine):
 
     def update(self, dt: float) -> None:
         # Clear the buffer (not the terminal screen, just the internal buffer)
-        self.buffer.fill(" ")
+        self.buffer.fill(ord(" "))
 
         # Handle user input (e.g., move piece left, right, rotate)
         if self.isKeyPressed("a"):
@@ -235,4 +261,6 @@ class TetrisGame(TerminalEngine):
 
     def run(self) -> None:
         self.new_piece()
+        # Compile the collision kernels before the first frame
+        self.ghost_row(self.current_piece[0], self.current_x, self.current_y)
         super().run()